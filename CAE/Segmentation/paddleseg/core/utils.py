@@ -13,7 +13,6 @@
 # limitations under the License.
 from functools import partial
 
-import math
 import numpy as np
 
 import paddle
@@ -37,15 +36,19 @@ def layerwise_lr_decay(decay_rate, name_dict, n_layers, param):
         n_layers (int):
             Total number of layers in the transformer encoder.
     """
+    ratio = _layerwise_lr_ratio(decay_rate, name_dict[param.name], n_layers)
+    param.optimize_attr["learning_rate"] *= ratio
+
+
+def _layerwise_lr_ratio(decay_rate, static_name, n_layers):
     ratio = 1.0
-    static_name = name_dict[param.name]
     if "blocks" in static_name:
         idx = static_name.find("blocks.")
         layer = int(static_name[idx:].split(".")[1])
         ratio = decay_rate**(n_layers - layer)
     elif "embed" in static_name:
         ratio = decay_rate**(n_layers + 1)
-    param.optimize_attr["learning_rate"] *= ratio
+    return ratio
 
 
 class AdamWDL(AdamW):
@@ -167,6 +170,15 @@ class AdamWDL(AdamW):
             raise TypeError("coeff should be float or Tensor.")
         self.layerwise_decay = layerwise_decay
         self.n_layers = n_layers
+        self._ratio_cache = None
+        if set_param_lr_fun is layerwise_lr_decay:
+            # The default ratios only depend on the static names, so compute
+            # them once here instead of re-parsing the names on every step.
+            self._ratio_cache = {
+                param_name: _layerwise_lr_ratio(layerwise_decay, static_name,
+                                                n_layers)
+                for param_name, static_name in (name_dict or {}).items()
+            }
         self.set_param_lr_fun = partial(set_param_lr_fun, layerwise_decay,
                                         name_dict, n_layers)
         super(AdamWDL, self).__init__(
@@ -188,11 +200,16 @@ class AdamWDL(AdamW):
                                                            param_and_grad)
 
         self._append_decoupled_weight_decay(block, param_and_grad)
-        prev_lr = param_and_grad[0].optimize_attr["learning_rate"]
-        self.set_param_lr_fun(param_and_grad[0])
+        param = param_and_grad[0]
+        prev_lr = param.optimize_attr["learning_rate"]
+        if self._ratio_cache is not None:
+            param.optimize_attr["learning_rate"] = prev_lr * self._ratio_cache.get(
+                param.name, 1.0)
+        else:
+            self.set_param_lr_fun(param)
         # excute Adam op
         res = super(AdamW, self)._append_optimize_op(block, param_and_grad)
-        param_and_grad[0].optimize_attr["learning_rate"] = prev_lr
+        param.optimize_attr["learning_rate"] = prev_lr
         return res
 
 AdamW = AdamWDL
@@ -204,26 +221,27 @@ def create_optimizer(model, filter_bias_and_bn=True, num_layers=None, skip_list=
 
     # weight_decay = args.weight_decay
 
-    if weight_decay and filter_bias_and_bn:
+    filter_decay = weight_decay and filter_bias_and_bn
+    if filter_decay:
         skip = {}
         if skip_list is not None:
             skip = skip_list
         elif hasattr(model, 'no_weight_decay'):
             skip = model.no_weight_decay()
-        decay_dict = {
-            param.name: not (len(param.shape) == 1 or name.endswith(".bias")
-                             or name in skip_list)
-            for name, param in model.named_parameters()
-            if not 'teacher' in name
-        } 
-
-        parameters = [
-            param for param in model.parameters()
-            if 'teacher' not in param.name
-        ]
+        decay_dict = {}
         weight_decay = 0.
-    else:
-        parameters = model.parameters()
+
+    # collect parameters, decay flags and names in a single pass
+    parameters = []
+    name_dict = dict()
+    for name, param in model.named_parameters():
+        name_dict[param.name] = name
+        if filter_decay:
+            if 'teacher' in name:
+                continue
+            decay_dict[param.name] = not (len(param.shape) == 1 or name.endswith(".bias")
+                                          or name in skip)
+        parameters.append(param)
 
     # opt_args = dict(learning_rate=args.lr, weight_decay=weight_decay)
     opt_args = dict(learning_rate=2e-4, weight_decay=weight_decay)
@@ -242,11 +260,9 @@ def create_optimizer(model, filter_bias_and_bn=True, num_layers=None, skip_list=
 
     layer_decay = 0.65
     opt_args['layerwise_decay'] = layer_decay
-    name_dict = dict()
-    for n, p in model.named_parameters():
-        name_dict[p.name] = n
     opt_args['name_dict'] = name_dict 
     opt_args['n_layers'] = num_layers 
+    opt_args['multi_precision'] = True
 
     # if hasattr(args, 'layer_decay') and args.layer_decay < 1.0:
     #     opt_args['layerwise_decay'] = args.layer_decay
@@ -299,12 +315,10 @@ def cosine_scheduler(base_value,
         warmup_schedule = np.linspace(start_warmup_value, base_value,
                                       warmup_iters)
 
-    iters = np.arange(total_iters - warmup_iters)
+    iters = np.arange(total_iters - warmup_iters, dtype=np.float64)
 
-    schedule = np.array([
-        final_value + 0.5 * (base_value - final_value) *
-        (1 + math.cos(math.pi * i / (len(iters)))) for i in iters
-    ])
+    schedule = final_value + 0.5 * (base_value - final_value) * (
+        1 + np.cos(np.pi * iters / len(iters)))
 
     schedule = np.concatenate((warmup_schedule, schedule))
 
@@ -319,7 +333,8 @@ def polynomial_scheduler(base_value,
                      total_iters,
                     #  warmup_epochs=0,
                      start_warmup_value=0,
-                     warmup_iters=-1):
+                     warmup_iters=-1,
+                     power=1.0):
     warmup_schedule = np.array([])
     # warmup_iters = warmup_epochs * niter_per_ep
     # warmup_iters = warmup_iters
@@ -331,14 +346,10 @@ def polynomial_scheduler(base_value,
 
     iters = total_iters - warmup_iters
 
-
-    scheduler = paddle.optimizer.lr.PolynomialDecay(learning_rate=base_value, decay_steps=iters, end_lr=final_value,  verbose=False)
-
-    values = []
-
-    for _ in range(iters):
-        values.append(scheduler.get_lr())
-        scheduler.step()
+    # Closed form of paddle.optimizer.lr.PolynomialDecay(cycle=False).
+    steps = np.arange(iters, dtype=np.float64)
+    values = final_value + (base_value - final_value) * (
+        1 - steps / iters)**power
 
     schedule = np.concatenate((warmup_schedule, values))
 
@@ -6,26 +6,27 @@ from util.adamw import AdamWDL as AdamW
 def create_optimizer(args, model, filter_bias_and_bn=True, num_layers=None, skip_list=None, decay_dict=None):
     opt_lower = args.opt.lower()
     weight_decay = args.weight_decay
-    if weight_decay and filter_bias_and_bn:
+    filter_decay = weight_decay and filter_bias_and_bn
+    if filter_decay:
         skip = {}
         if skip_list is not None:
             skip = skip_list
         elif hasattr(model, 'no_weight_decay'):
             skip = model.no_weight_decay()
-        decay_dict = {
-            param.name: not (len(param.shape) == 1 or name.endswith(".bias")
-                             or name in skip_list)
-            for name, param in model.named_parameters()
-            if not 'teacher' in name
-        } 
-
-        parameters = [
-            param for param in model.parameters()
-            if 'teacher' not in param.name
-        ]
+        decay_dict = {}
         weight_decay = 0.
-    else:
-        parameters = model.parameters()
+
+    # collect parameters, decay flags and names in a single pass
+    parameters = []
+    name_dict = dict()
+    for name, param in model.named_parameters():
+        name_dict[param.name] = name
+        if filter_decay:
+            if 'teacher' in name:
+                continue
+            decay_dict[param.name] = not (len(param.shape) == 1 or name.endswith(".bias")
+                                          or name in skip)
+        parameters.append(param)
 
     opt_args = dict(learning_rate=args.lr, weight_decay=weight_decay)
     opt_args['parameters'] = parameters 
@@ -38,9 +39,6 @@ def create_optimizer(args, model, filter_bias_and_bn=True, num_layers=None, skip
         opt_args['beta2'] = args.opt_betas[1]
     if hasattr(args, 'layer_decay') and args.layer_decay < 1.0:
         opt_args['layerwise_decay'] = args.layer_decay
-        name_dict = dict()
-        for n, p in model.named_parameters():
-            name_dict[p.name] = n
         opt_args['name_dict'] = name_dict 
         opt_args['n_layers'] = num_layers 
     
@@ -55,6 +53,7 @@ def create_optimizer(args, model, filter_bias_and_bn=True, num_layers=None, skip
     elif opt_lower == 'adam':
         optimizer = optim.Adam(**opt_args)
     elif opt_lower == 'adamw':
+        opt_args['multi_precision'] = True
         optimizer = AdamW(**opt_args)
     elif opt_lower == 'adadelta':
         optimizer = optim.Adadelta(**opt_args)
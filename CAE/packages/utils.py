@@ -1,6 +1,5 @@
 import io
 import os
-import math
 import time
 import json
 from collections import defaultdict, deque
@@ -222,11 +221,9 @@ def cosine_scheduler(base_value,
         warmup_schedule = np.linspace(start_warmup_value, base_value,
                                       warmup_iters)
 
-    iters = np.arange(epochs * niter_per_ep - warmup_iters)
-    schedule = np.array([
-        final_value + 0.5 * (base_value - final_value) *
-        (1 + math.cos(math.pi * i / (len(iters)))) for i in iters
-    ])
+    iters = np.arange(epochs * niter_per_ep - warmup_iters, dtype=np.float64)
+    schedule = final_value + 0.5 * (base_value - final_value) * (
+        1 + np.cos(np.pi * iters / len(iters)))
 
     schedule = np.concatenate((warmup_schedule, schedule))
 
@@ -34,15 +34,19 @@ def layerwise_lr_decay(decay_rate, name_dict, n_layers, param):
         n_layers (int):
             Total number of layers in the transformer encoder.
     """
+    ratio = _layerwise_lr_ratio(decay_rate, name_dict[param.name], n_layers)
+    param.optimize_attr["learning_rate"] *= ratio
+
+
+def _layerwise_lr_ratio(decay_rate, static_name, n_layers):
     ratio = 1.0
-    static_name = name_dict[param.name]
     if "blocks" in static_name:
         idx = static_name.find("blocks.")
         layer = int(static_name[idx:].split(".")[1])
         ratio = decay_rate**(n_layers - layer)
     elif "embed" in static_name:
         ratio = decay_rate**(n_layers + 1)
-    param.optimize_attr["learning_rate"] *= ratio
+    return ratio
 
 
 class AdamWDL(AdamW):
@@ -164,6 +168,15 @@ class AdamWDL(AdamW):
             raise TypeError("coeff should be float or Tensor.")
         self.layerwise_decay = layerwise_decay
         self.n_layers = n_layers
+        self._ratio_cache = None
+        if set_param_lr_fun is layerwise_lr_decay:
+            # The default ratios only depend on the static names, so compute
+            # them once here instead of re-parsing the names on every step.
+            self._ratio_cache = {
+                param_name: _layerwise_lr_ratio(layerwise_decay, static_name,
+                                                n_layers)
+                for param_name, static_name in (name_dict or {}).items()
+            }
         self.set_param_lr_fun = partial(set_param_lr_fun, layerwise_decay,
                                         name_dict, n_layers)
         super(AdamWDL, self).__init__(
@@ -185,9 +198,14 @@ class AdamWDL(AdamW):
                                                            param_and_grad)
 
         self._append_decoupled_weight_decay(block, param_and_grad)
-        prev_lr = param_and_grad[0].optimize_attr["learning_rate"]
-        self.set_param_lr_fun(param_and_grad[0])
+        param = param_and_grad[0]
+        prev_lr = param.optimize_attr["learning_rate"]
+        if self._ratio_cache is not None:
+            param.optimize_attr["learning_rate"] = prev_lr * self._ratio_cache.get(
+                param.name, 1.0)
+        else:
+            self.set_param_lr_fun(param)
         # excute Adam op
         res = super(AdamW, self)._append_optimize_op(block, param_and_grad)
-        param_and_grad[0].optimize_attr["learning_rate"] = prev_lr
+        param.optimize_attr["learning_rate"] = prev_lr
         return res
@@ -20,6 +20,7 @@ from __future__ import unicode_literals
 
 import os
 import sys
+import cv2
 import copy
 import paddle
 import signal
@@ -50,6 +51,13 @@ def _term_mp(sig_num, frame):
 signal.signal(signal.SIGINT, _term_mp)
 signal.signal(signal.SIGTERM, _term_mp)
 
+
+def _worker_init(worker_id):
+    """ keep opencv single threaded in the DataLoader worker processes
+    """
+    cv2.setNumThreads(1)
+
+
 def build_dataloader(config, dataset, mode, device, distributed=False):
     """ build_dataloader """
 
@@ -68,6 +76,7 @@ def build_dataloader(config, dataset, mode, device, distributed=False):
             places=device,
             timeout=60,
             num_workers=num_workers,
+            worker_init_fn=_worker_init,
             return_list=True)
         return data_loader
     if distributed and not collect_batch:
@@ -92,6 +101,7 @@ def build_dataloader(config, dataset, mode, device, distributed=False):
         places=device,
         timeout=60,
         num_workers=num_workers,
+        worker_init_fn=_worker_init,
         return_list=True)
 
     return data_loader
@@ -17,25 +17,46 @@
 
 from functools import partial
 
+import os
 import math
-import random
 import numpy as np
 
 __all__ = ['RandomErasing']
 
+# number of erasing sizes drawn at once, the first one fits in most cases
+_CANDIDATE_BATCH = 4
+
+
+class _ProcessRNG(object):
+    """ numpy Generator which is re-created in every (forked) worker process """
+    def __init__(self):
+        self._pid = None
+        self._rng = None
+
+    def __call__(self):
+        pid = os.getpid()
+        if self._pid != pid:
+            self._pid = pid
+            self._rng = np.random.default_rng()
+        return self._rng
+
+
 class Pixels(object):
     """ Pixels """
     def __init__(self, mode="const", mean=[0., 0., 0.]):
         self._mode = mode
         self._mean = mean
+        # broadcastable [1, 1, C] patch, no list conversion on every erase
+        self._mean_arr = np.asarray(mean, dtype=np.float32).reshape(1, 1, -1)
+        self._rng = _ProcessRNG()
 
-    def __call__(self, h=224, w=224, c=3):
+    def __call__(self, h=224, w=224, c=3, rng=None):
         if self._mode == "rand":
-            return np.random.normal(size=(1, 1, 3))
+            return (rng or self._rng()).standard_normal((1, 1, 3))
         elif self._mode == "pixel":
-            return np.random.normal(size=(h, w, c))
+            return (rng or self._rng()).standard_normal((h, w, c))
         elif self._mode == "const":
-            return self._mean
+            return self._mean_arr
         else:
             raise Exception(
                 "Invalid mode in RandomErasing, only support \"const\", \"rand\", \"pixel\""
@@ -64,33 +85,49 @@ class RandomErasing(object):
         self.use_log_aspect = use_log_aspect
         self.attempt = attempt
         self.get_pixels = Pixels(mode, mean)
+        self._rng = _ProcessRNG()
+
+    def _sample_size(self, rng, img_h, img_w):
+        """ sample the erasing size within self.attempt tries, None if nothing fits """
+        area = img_h * img_w
+        for start in range(0, self.attempt, _CANDIDATE_BATCH):
+            n = min(_CANDIDATE_BATCH, self.attempt - start)
+            for s, r in rng.random((n, 2)).tolist():
+                target_area = (self.sl + (self.sh - self.sl) * s) * area
+                aspect_ratio = self.r1[0] + (self.r1[1] - self.r1[0]) * r
+                if self.use_log_aspect:
+                    aspect_ratio = math.exp(aspect_ratio)
+
+                h = int(round(math.sqrt(target_area * aspect_ratio)))
+                w = int(round(math.sqrt(target_area / aspect_ratio)))
+                if w < img_w and h < img_h:
+                    return h, w
+        return None
 
     def __call__(self, data):
-        if random.random() > self.EPSILON:
+        rng = self._rng()
+        # one draw for the EPSILON gate and the position of the erased box
+        gate, u_x, u_y = rng.random(3).tolist()
+        if gate > self.EPSILON:
             return data
 
         img = data['image']
-        channel_first = False
-        if img.ndim == 3 and img.shape[0] == 3:
-            channel_first = True
-            img = np.transpose(img, (1, 2, 0))
-
-        for _ in range(self.attempt):
-            area = img.shape[0] * img.shape[1]
-
-            target_area = random.uniform(self.sl, self.sh) * area
-            aspect_ratio = random.uniform(*self.r1)
-            if self.use_log_aspect:
-                aspect_ratio = math.exp(aspect_ratio)
-
-            h = int(round(math.sqrt(target_area * aspect_ratio)))
-            w = int(round(math.sqrt(target_area / aspect_ratio)))
-
-            if w < img.shape[1] and h < img.shape[0]:
-                pixels = self.get_pixels(h, w, img.shape[2])
-                x1 = random.randint(0, img.shape[0] - h)
-                y1 = random.randint(0, img.shape[1] - w)
+        # erase in place on either layout instead of transposing the image
+        channel_first = img.ndim == 3 and img.shape[0] == 3
+        if channel_first:
+            c, img_h, img_w = img.shape
+        else:
+            img_h, img_w, c = img.shape
+
+        size = self._sample_size(rng, img_h, img_w)
+        if size is not None:
+            h, w = size
+            pixels = self.get_pixels(h, w, c, rng)
+            x1 = int(u_x * (img_h - h + 1))
+            y1 = int(u_y * (img_w - w + 1))
+            if channel_first:
+                img[:, x1:x1 + h, y1:y1 + w] = pixels.transpose((2, 0, 1))
+            else:
                 img[x1:x1 + h, y1:y1 + w] = pixels
-                break
-        data['image'] = np.transpose(img, (2, 0, 1)) if channel_first else img
+        data['image'] = img
         return data
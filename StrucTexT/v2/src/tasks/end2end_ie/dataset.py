@@ -9,16 +9,21 @@ from __future__ import print_function
 import os
 import sys
 import cv2
-import json
 import copy
 import glob
-import codecs
+import pickle
 import logging
 import numpy as np
 
 import paddle
 import paddle.fluid as fluid
 
+try:
+    # orjson is an optional, faster drop-in for parsing the annotation files
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
 __dir__ = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(os.path.abspath(os.path.join(__dir__, '../../..')))
 
@@ -39,6 +44,15 @@ Lexicon_Table_95 = ['!', '\"', '#', '$', '%', '&', '\'', '(', ')', '*', '+', ','
     'd', 'e', 'f', 'g', 'h', 'i', 'j', 'k', 'l', 'm', 'n', 'o', 'p', 'q', 'r', 's', 't', \
     'u', 'v', 'w', 'x', 'y', 'z', '{', '|', '}', '~', ' ']
 
+# suffix of the parsed annotation cache stored next to the annotation file
+ANNO_CACHE_SUFFIX = '.cache.pkl'
+# bump it whenever the records returned by _load_ann_info_funsd change
+ANNO_CACHE_VERSION = 1
+
+# deletion table for the ascii characters which are not in Lexicon_Table_95
+_LEXICON_95_TRANS = str.maketrans('', '', ''.join(
+    chr(c) for c in range(128) if chr(c) not in Lexicon_Table_95))
+
 class LabelConverter(object):
     """convert between text and lexicon index"""
     def __init__(self, seq_len=50, lexicon=None, recg_loss='CE'):
@@ -58,6 +72,14 @@ class LabelConverter(object):
         for i, char in enumerate(self.idx2char):
             self.char2idx[char] = i
 
+        # lookup table from latin-1 code to lexicon index, used by encode_batch
+        self.char_lut = np.full(256, self.char2idx['[PAD]'], dtype=np.int64)
+        for char, i in self.char2idx.items():
+            if len(char) == 1 and ord(char) < 256:
+                self.char_lut[ord(char)] = i
+        self.stop_idx = self.char2idx['[STOP]']
+        self.pad_idx = self.char2idx['[PAD]']
+
     def encode(self, text, ignore_tag):
         """ encode character into index
         Input:
@@ -81,6 +103,35 @@ class LabelConverter(object):
 
         return new_text_idx, text_idx
 
+    def encode_batch(self, texts, ignore_tags):
+        """ encode a list of transcripts at once, same as encode on each text
+        Input:
+            texts: the transcripts of ground truth <List>
+            ignore_tags: the flags to ignore the texts <List>
+        Output:
+            new_text_idx: the padded text index of the input texts, [N, seq_len] <ndarray>
+            text_idx: the text index of each input text with [STOP] <List>
+        """
+        new_text_idx = np.full((len(texts), self.seq_len), self.pad_idx, dtype=np.int64)
+        if len(texts) == 0:
+            return new_text_idx, []
+
+        encoded = [b'' if ignore_tag else text.upper().encode('latin1', 'ignore')
+                   for text, ignore_tag in zip(texts, ignore_tags)]
+        lens = np.array([len(x) for x in encoded], dtype=np.int64)
+        chars = self.char_lut[np.frombuffer(b''.join(encoded), dtype=np.uint8)]
+
+        # scatter every character to (text, position), then the [STOP] token
+        rows = np.repeat(np.arange(len(texts)), lens)
+        cols = np.arange(len(chars)) - np.repeat(np.cumsum(lens) - lens, lens)
+        keep = cols < self.seq_len
+        new_text_idx[rows[keep], cols[keep]] = chars[keep]
+        has_stop = lens < self.seq_len
+        new_text_idx[has_stop, lens[has_stop]] = self.stop_idx
+
+        text_idx = [x.tolist() + [self.stop_idx] for x in np.split(chars, np.cumsum(lens)[:-1])]
+        return new_text_idx, text_idx
+
     def decode(self, text_idx):
         """ convert text-index into text-label.
         Input:
@@ -104,29 +155,66 @@ class LabelConverter(object):
 
 def _sort_box_with_list(anno, left_right_first=False):
     """sort bbox"""
-    def compare_key(x):
-        """ compare_key """
-        poly = x[0]
-        poly = np.array(poly, dtype=np.float32).reshape(-1, 2)
-        rect = cv2.minAreaRect(poly)
-        center = rect[0]
-        # from left to right
-        if left_right_first:
-            return center[0], center[1]
-        else:
-        # from top to bottom
-            return center[1], center[0]
-    anno = sorted(anno, key=compare_key)
+    if not anno:
+        return anno
+    centers = np.array([
+        cv2.minAreaRect(np.asarray(x[0], dtype=np.float32).reshape(-1, 2))[0]
+        for x in anno], dtype=np.float32)
+    # from left to right
+    if left_right_first:
+        order = np.lexsort((centers[:, 1], centers[:, 0]))
+    else:
+    # from top to bottom
+        order = np.lexsort((centers[:, 0], centers[:, 1]))
+    anno = [anno[i] for i in order]
     return anno
 
 
-def _bbox2poly(bbox):
-    """ _bbox2poly """
-    poly = [bbox[0], bbox[1], bbox[2], bbox[1], bbox[2], bbox[3], bbox[0], bbox[3]]
-    return poly
+def _bboxes2polys(bboxes):
+    """ convert [N, 4] bboxes into [N, 4, 2] polys at once """
+    bboxes = np.asarray(bboxes, dtype=np.float32).reshape(-1, 4)
+    return bboxes[:, [0, 1, 2, 1, 2, 3, 0, 3]].reshape(-1, 4, 2)
+
+
+def _filter_lexicon(transcript):
+    """ keep the characters of Lexicon_Table_95 only """
+    return transcript.encode('ascii', 'ignore').decode('ascii').translate(_LEXICON_95_TRANS)
 
 
-def _parse_ann_info_funsd(anno_path):
+def _parse_ann_info_funsd(anno_path, use_cache=False):
+    """load annos from anno_path, reuse the parsed cache if it is up to date
+    Input:
+        anno_path: absolute path of annoataion file <Str>
+        use_cache: whether to read/write the parsed cache of anno_path <Bool>
+    Output:
+        res: the same as _load_ann_info_funsd
+    """
+    if not use_cache:
+        return _load_ann_info_funsd(anno_path)
+
+    cache_path = anno_path + ANNO_CACHE_SUFFIX
+    if os.path.isfile(cache_path) and \
+            os.path.getmtime(cache_path) >= os.path.getmtime(anno_path):
+        try:
+            with open(cache_path, 'rb') as f:
+                cache = pickle.load(f)
+            if isinstance(cache, dict) and cache.get('version') == ANNO_CACHE_VERSION:
+                return cache['anno']
+        except Exception:
+            logging.debug('Dataset... Error in load cache %s', cache_path)
+
+    res = _load_ann_info_funsd(anno_path)
+    tmp_path = '%s.%d' % (cache_path, os.getpid())
+    try:
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'version': ANNO_CACHE_VERSION, 'anno': res}, f, protocol=4)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        logging.debug('Dataset... Error in write cache %s', cache_path)
+    return res
+
+
+def _load_ann_info_funsd(anno_path):
     """load annos from anno_path
     Input:
         anno_path: absolute path of annoataion file <Str>
@@ -134,23 +222,22 @@ def _parse_ann_info_funsd(anno_path):
         res: (poly, transcript, text_class, ignore_tag) <Tuple>
     """
     res = {'word': [], 'line': []}
-    with codecs.open(anno_path, 'r', 'utf-8') as f:
-        data = json.load(f)
+    with open(anno_path, 'rb') as f:
+        data = json_loads(f.read())
 
     ## funsd word level
-    for line in data['form']:
-        box, transcript, label = line['box'], line['text'], line['label']
-        if len(transcript) == 0:
-            continue
-        poly = _bbox2poly(list(map(float, box)))
-        transcript = ''.join(filter(lambda char: char in Lexicon_Table_95, transcript))
-        text_class = TEXT_CLASSES[label]
+    lines = [line for line in data['form'] if len(line['text']) > 0]
+    words = [word for line in lines for word in line['words']]
+    polys_line = _bboxes2polys([line['box'] for line in lines])
+    polys_word = _bboxes2polys([word['box'] for word in words])
+
+    for poly, line in zip(polys_line, lines):
+        transcript = _filter_lexicon(line['text'])
+        text_class = TEXT_CLASSES[line['label']]
         res['line'].append((poly, transcript, text_class, False))
-        for word in line['words']:
-            box, transcript = word['box'], word['text']
-            poly = _bbox2poly(list(map(float, box)))
-            transcript = ''.join(filter(lambda char: char in Lexicon_Table_95, transcript))
-            res['word'].append((poly, transcript, -1, False))
+    for poly, word in zip(polys_word, words):
+        transcript = _filter_lexicon(word['text'])
+        res['word'].append((poly, transcript, -1, False))
 
     if len(res['line']) == 0 or len(res['word']) == 0:
         return None
@@ -174,7 +261,16 @@ class Dataset(BaseDataset):
 
         if os.path.isdir(data_path):
             labels = glob.glob(data_path + '/*.*')
-            label_list = [[label_path, image_path] for label_path in labels]
+            labels = [x for x in labels if ANNO_CACHE_SUFFIX not in x]
+            # resolve the image of each label once instead of in every epoch
+            label_list = []
+            for label_path in labels:
+                image_name = os.path.basename(label_path).replace('.json', '.png')
+                image_file = os.path.join(image_path, image_name)
+                if not os.path.isfile(image_file):
+                    logging.warning('Dataset... The file (%s) is not existed!', image_file)
+                    continue
+                label_list.append([label_path, image_file])
             label_list = [label_list]
         else:
             raise ValueError('error in load data_path for funsd: ', subdata_label_path)
@@ -190,6 +286,7 @@ class Dataset(BaseDataset):
 
         self.seq_len = config.get('max_seq_len', 50)
         self.recg_loss = config.get('recg_loss', 'CE')
+        self.anno_cache = config.get('anno_cache', False)
         self.label_converter = LabelConverter(
             seq_len=self.seq_len,
             recg_loss=self.recg_loss)
@@ -200,7 +297,7 @@ class Dataset(BaseDataset):
         config = self.config
         example = examples[0]
         anno_path = example['boxes_and_texts_file']
-        anno = _parse_ann_info_funsd(anno_path)
+        anno = _parse_ann_info_funsd(anno_path, self.anno_cache)
         if anno is None:
             return None
         anno_line, anno_word = anno['line'], anno['word']
@@ -208,65 +305,65 @@ class Dataset(BaseDataset):
         anno_line = _sort_box_with_list(anno_line)
         anno_word = _sort_box_with_list(anno_word)
 
-        polys_word = []
-        texts_word = []
-        classes_word = []
-        ignore_tags_word = []
+        n_word = len(anno_word)
+        polys_word = np.empty((n_word, 4, 2), dtype=np.float32)
+        classes_word = np.empty(n_word, dtype=np.int64)
+        ignore_tags_word = np.empty(n_word, dtype=np.bool_)
 
-        for poly, text, text_class, ignore_tag in anno_word:
-            polys_word.append(poly)
-            classes_word.append(text_class)
-            texts_word.append(self.label_converter.encode(text, ignore_tag)[0])
-            ignore_tags_word.append(ignore_tag)
+        for i, (poly, text, text_class, ignore_tag) in enumerate(anno_word):
+            polys_word[i] = np.asarray(poly, dtype=np.float32).reshape(4, 2)
+            classes_word[i] = text_class
+            ignore_tags_word[i] = ignore_tag
+        texts_word = self.label_converter.encode_batch(
+            [x[1] for x in anno_word], ignore_tags_word)[0]
 
         label_word = {}
-        label_word['polys'] = np.array(polys_word, dtype=np.float32).reshape(-1, 4, 2)
-        label_word['texts'] = np.array(texts_word, dtype=np.int64)
-        label_word['classes'] = np.array(classes_word, dtype=np.int64)
-        label_word['ignore_tags'] = np.array(ignore_tags_word, dtype=np.bool)
-
-        polys_line = []
-        texts_line = []
-        classes_line = []
-        ignore_tags_line = []
-
-        for poly, text, text_class, ignore_tag in anno_line:
-            polys_line.append(poly)
-            texts_line.append(self.label_converter.encode(text, ignore_tag)[1])
-            ignore_tags_line.append(ignore_tag)
-            classes_line.append(text_class)
+        label_word['polys'] = polys_word
+        label_word['texts'] = texts_word
+        label_word['classes'] = classes_word
+        label_word['ignore_tags'] = ignore_tags_word
+
+        n_line = len(anno_line)
+        polys_line = np.empty((n_line, 4, 2), dtype=np.float32)
+        classes_line = np.empty(n_line, dtype=np.int64)
+        ignore_tags_line = np.empty(n_line, dtype=np.bool_)
+
+        for i, (poly, text, text_class, ignore_tag) in enumerate(anno_line):
+            polys_line[i] = np.asarray(poly, dtype=np.float32).reshape(4, 2)
+            ignore_tags_line[i] = ignore_tag
+            classes_line[i] = text_class
+        texts_line = self.label_converter.encode_batch(
+            [x[1] for x in anno_line], ignore_tags_line)[1]
 
         label_line = {}
-        label_line['polys'] = np.array(polys_line, dtype=np.float32).reshape(-1, 4, 2)
+        label_line['polys'] = polys_line
         label_line['texts'] = texts_line
-        label_line['classes'] = np.array(classes_line, dtype=np.int64)
-        label_line['ignore_tags'] = np.array(ignore_tags_line, dtype=np.bool)
+        label_line['classes'] = classes_line
+        label_line['ignore_tags'] = ignore_tags_line
 
         example = {'image': example['image'], 'multi_label': [label_word, label_line]}
         transform_out = self.transform(example)
-        data = transform_out[0]
-        for key, val in transform_out[1].items():
-            if key not in ['image', 'ratio']:
-                data[key + '_line'] = val
+        # DBTextSpottingTest output of the word and the line labels
+        data, line = transform_out
+        data['bboxes_padded_list_line'] = line['bboxes_padded_list']
+        data['bboxes_4pts_padded_list_line'] = line['bboxes_4pts_padded_list']
+        data['texts_padded_list_line'] = line['texts_padded_list']
+        data['classes_padded_list_line'] = line['classes_padded_list']
+        data['masks_padded_list_line'] = line['masks_padded_list']
         return data
 
     def _read_data(self, example):
         """load image from image path and return image with data path
         Input:
-            example: ['X51005268200.txt', '../funsd/training_data/image/'] <List>
+            example: ['X51005268200.json', '../funsd/training_data/image/X51005268200.png'] <List>
         Output:
             example: readed image and label path <Dict>
         """
 
         data_path, image_path = example
-        image_name = os.path.basename(data_path).replace('.json', '.png')
-        image_path = os.path.join(image_path, image_name)
-
-        if not os.path.exists(image_path):
-            logging.warning('Dataset... The file (%s) is not existed!', image_path)
-            return None
         try:
-            image = cv2.imread(image_path)
+            buf = np.fromfile(image_path, dtype=np.uint8)
+            image = cv2.imdecode(buf, cv2.IMREAD_COLOR)
         except:
             logging.debug('Dataset... Error in read %s', image_path)
             return None
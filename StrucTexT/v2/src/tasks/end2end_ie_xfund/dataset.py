@@ -9,16 +9,20 @@ from __future__ import print_function
 import os
 import sys
 import cv2
-import json
 import copy
 import glob
-import codecs
 import logging
 import numpy as np
 
 import paddle
 import paddle.fluid as fluid
 
+try:
+    # orjson is an optional, faster drop-in for parsing the annotation files
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
 __dir__ = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(os.path.abspath(os.path.join(__dir__, '../../..')))
 
@@ -39,6 +43,10 @@ Lexicon_Table_95 = ['!', '\"', '#', '$', '%', '&', '\'', '(', ')', '*', '+', ','
     'd', 'e', 'f', 'g', 'h', 'i', 'j', 'k', 'l', 'm', 'n', 'o', 'p', 'q', 'r', 's', 't', \
     'u', 'v', 'w', 'x', 'y', 'z', '{', '|', '}', '~', ' ']
 
+# deletion table for the ascii characters which are not in Lexicon_Table_95
+_LEXICON_95_TRANS = str.maketrans('', '', ''.join(
+    chr(c) for c in range(128) if chr(c) not in Lexicon_Table_95))
+
 class LabelConverter(object):
     """convert between text and lexicon index"""
     def __init__(self, seq_len=50, lexicon=None, recg_loss='CE'):
@@ -104,19 +112,18 @@ class LabelConverter(object):
 
 def _sort_box_with_list(anno, left_right_first=False):
     """sort bbox"""
-    def compare_key(x):
-        """ compare_key """
-        poly = x[0]
-        poly = np.array(poly, dtype=np.float32).reshape(-1, 2)
-        rect = cv2.minAreaRect(poly)
-        center = rect[0]
-        # from left to right
-        if left_right_first:
-            return center[0], center[1]
-        else:
-        # from top to bottom
-            return center[1], center[0]
-    anno = sorted(anno, key=compare_key)
+    if not anno:
+        return anno
+    centers = np.array([
+        cv2.minAreaRect(np.asarray(x[0], dtype=np.float32).reshape(-1, 2))[0]
+        for x in anno], dtype=np.float32)
+    # from left to right
+    if left_right_first:
+        order = np.lexsort((centers[:, 1], centers[:, 0]))
+    else:
+    # from top to bottom
+        order = np.lexsort((centers[:, 0], centers[:, 1]))
+    anno = [anno[i] for i in order]
     return anno
 
 
@@ -126,6 +133,11 @@ def _bbox2poly(bbox):
     return poly
 
 
+def _filter_lexicon(transcript):
+    """ keep the characters of Lexicon_Table_95 only """
+    return transcript.encode('ascii', 'ignore').decode('ascii').translate(_LEXICON_95_TRANS)
+
+
 def _parse_ann_info_funsd(anno_path):
     """load annos from anno_path
     Input:
@@ -134,8 +146,8 @@ def _parse_ann_info_funsd(anno_path):
         res: (poly, transcript, text_class, ignore_tag) <Tuple>
     """
     res = {'word': [], 'line': []}
-    with codecs.open(anno_path, 'r', 'utf-8') as f:
-        data = json.load(f)
+    with open(anno_path, 'rb') as f:
+        data = json_loads(f.read())
 
     ## funsd word level
     for line in data['form']:
@@ -143,13 +155,13 @@ def _parse_ann_info_funsd(anno_path):
         if len(transcript) == 0:
             continue
         poly = _bbox2poly(list(map(float, box)))
-        transcript = ''.join(filter(lambda char: char in Lexicon_Table_95, transcript))
+        transcript = _filter_lexicon(transcript)
         text_class = TEXT_CLASSES[label]
         res['line'].append((poly, transcript, text_class, False))
         for word in line['words']:
             box, transcript = word['box'], word['text']
             poly = _bbox2poly(list(map(float, box)))
-            transcript = ''.join(filter(lambda char: char in Lexicon_Table_95, transcript))
+            transcript = _filter_lexicon(transcript)
             res['word'].append((poly, transcript, -1, False))
 
     if len(res['line']) == 0 or len(res['word']) == 0:
@@ -172,7 +184,7 @@ def _parse_ann_info_xfund(anno_path, image_path):
             if file_name != image_path:
                 continue
 
-            line_data = json.loads(anno_str)
+            line_data = json_loads(anno_str)
 
             for line in line_data['ocr_info']:
                 ignore_tag = False
@@ -259,7 +271,7 @@ class Dataset(BaseDataset):
         label_word['polys'] = np.array(polys, dtype=np.float32).reshape(-1, 4, 2)
         label_word['texts'] = np.array(texts, dtype=np.int64)
         label_word['classes'] = np.array(classes, dtype=np.int64)
-        label_word['ignore_tags'] = np.array(ignore_tags, dtype=np.bool)
+        label_word['ignore_tags'] = np.array(ignore_tags, dtype=np.bool_)
 
         data = self.transform(label_word)
         data['image_path'] = image_path.split("/")[-1]
@@ -280,7 +292,8 @@ class Dataset(BaseDataset):
             logging.warning('Dataset... The file (%s) is not existed!', image_path)
             return None
         try:
-            image = cv2.imread(image_path)
+            buf = np.fromfile(image_path, dtype=np.uint8)
+            image = cv2.imdecode(buf, cv2.IMREAD_COLOR)
         except:
             logging.debug('Dataset... Error in read %s', image_path)
             return None
@@ -9,16 +9,21 @@ from __future__ import print_function
 import os
 import sys
 import cv2
-import json
 import copy
 import glob
-import codecs
+import pickle
 import logging
 import numpy as np
 
 import paddle
 import paddle.fluid as fluid
 
+try:
+    # orjson is an optional, faster drop-in for parsing the annotation files
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
 __dir__ = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(os.path.abspath(os.path.join(__dir__, '../../..')))
 
@@ -33,6 +38,15 @@ Lexicon_Table_95 = ['!', '\"', '#', '$', '%', '&', '\'', '(', ')', '*', '+', ','
     'd', 'e', 'f', 'g', 'h', 'i', 'j', 'k', 'l', 'm', 'n', 'o', 'p', 'q', 'r', 's', 't', \
     'u', 'v', 'w', 'x', 'y', 'z', '{', '|', '}', '~', ' ']
 
+# suffix of the parsed annotation cache stored next to the annotation file
+ANNO_CACHE_SUFFIX = '.cache.pkl'
+# bump it whenever the records returned by _load_ann_info_funsd change
+ANNO_CACHE_VERSION = 1
+
+# deletion table for the ascii characters which are not in Lexicon_Table_95
+_LEXICON_95_TRANS = str.maketrans('', '', ''.join(
+    chr(c) for c in range(128) if chr(c) not in Lexicon_Table_95))
+
 class LabelConverter(object):
     """convert between text and lexicon index"""
     def __init__(self, seq_len=50, lexicon=None, recg_loss='CE'):
@@ -98,29 +112,66 @@ class LabelConverter(object):
 
 def _sort_box_with_list(anno, left_right_first=False):
     """sort bbox"""
-    def compare_key(x):
-        """ compare_key """
-        poly = x[0]
-        poly = np.array(poly, dtype=np.float32).reshape(-1, 2)
-        rect = cv2.minAreaRect(poly)
-        center = rect[0]
-        # from left to right
-        if left_right_first:
-            return center[0], center[1]
-        else:
-        # from top to bottom
-            return center[1], center[0]
-    anno = sorted(anno, key=compare_key)
+    if not anno:
+        return anno
+    centers = np.array([
+        cv2.minAreaRect(np.asarray(x[0], dtype=np.float32).reshape(-1, 2))[0]
+        for x in anno], dtype=np.float32)
+    # from left to right
+    if left_right_first:
+        order = np.lexsort((centers[:, 1], centers[:, 0]))
+    else:
+    # from top to bottom
+        order = np.lexsort((centers[:, 0], centers[:, 1]))
+    anno = [anno[i] for i in order]
     return anno
 
 
-def _bbox2poly(bbox):
-    """ _bbox2poly """
-    poly = [bbox[0], bbox[1], bbox[2], bbox[1], bbox[2], bbox[3], bbox[0], bbox[3]]
-    return poly
+def _bboxes2polys(bboxes):
+    """ convert [N, 4] bboxes into [N, 4, 2] polys at once """
+    bboxes = np.asarray(bboxes, dtype=np.float32).reshape(-1, 4)
+    return bboxes[:, [0, 1, 2, 1, 2, 3, 0, 3]].reshape(-1, 4, 2)
+
 
+def _filter_lexicon(transcript):
+    """ keep the characters of Lexicon_Table_95 only """
+    return transcript.encode('ascii', 'ignore').decode('ascii').translate(_LEXICON_95_TRANS)
 
-def _parse_ann_info_funsd(anno_path):
+
+def _parse_ann_info_funsd(anno_path, use_cache=False):
+    """load annos from anno_path, reuse the parsed cache if it is up to date
+    Input:
+        anno_path: absolute path of annoataion file <Str>
+        use_cache: whether to read/write the parsed cache of anno_path <Bool>
+    Output:
+        res: the same as _load_ann_info_funsd
+    """
+    if not use_cache:
+        return _load_ann_info_funsd(anno_path)
+
+    cache_path = anno_path + ANNO_CACHE_SUFFIX
+    if os.path.isfile(cache_path) and \
+            os.path.getmtime(cache_path) >= os.path.getmtime(anno_path):
+        try:
+            with open(cache_path, 'rb') as f:
+                cache = pickle.load(f)
+            if isinstance(cache, dict) and cache.get('version') == ANNO_CACHE_VERSION:
+                return cache['anno']
+        except Exception:
+            logging.debug('Dataset... Error in load cache %s', cache_path)
+
+    res = _load_ann_info_funsd(anno_path)
+    tmp_path = '%s.%d' % (cache_path, os.getpid())
+    try:
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'version': ANNO_CACHE_VERSION, 'anno': res}, f, protocol=4)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        logging.debug('Dataset... Error in write cache %s', cache_path)
+    return res
+
+
+def _load_ann_info_funsd(anno_path):
     """load annos from anno_path
     Input:
         anno_path: absolute path of annoataion file <Str>
@@ -128,17 +179,16 @@ def _parse_ann_info_funsd(anno_path):
         res: (poly, transcript, text_class, ignore_tag) <Tuple>
     """
     res = []
-    with codecs.open(anno_path, 'r', 'utf-8') as f:
-        data = json.load(f)
+    with open(anno_path, 'rb') as f:
+        data = json_loads(f.read())
 
     ## funsd word level
-    for line in data['form']:
-        for word in line['words']:
-            ignore_tag = False
-            box, transcript = word['box'], word['text']
-            poly = _bbox2poly(list(map(float, box)))
-            transcript = ''.join(filter(lambda char: char in Lexicon_Table_95, transcript))
-            res.append((poly, transcript, -1, ignore_tag))
+    words = [word for line in data['form'] for word in line['words']]
+    polys = _bboxes2polys([word['box'] for word in words])
+    for poly, word in zip(polys, words):
+        ignore_tag = False
+        transcript = _filter_lexicon(word['text'])
+        res.append((poly, transcript, -1, ignore_tag))
 
     if len(res) == 0:
         return None
@@ -162,7 +212,16 @@ class Dataset(BaseDataset):
 
         if os.path.isdir(data_path):
             labels = glob.glob(data_path + '/*.*')
-            label_list = [[label_path, image_path] for label_path in labels]
+            labels = [x for x in labels if ANNO_CACHE_SUFFIX not in x]
+            # resolve the image of each label once instead of in every epoch
+            label_list = []
+            for label_path in labels:
+                image_name = os.path.basename(label_path).replace('.json', '.png')
+                image_file = os.path.join(image_path, image_name)
+                if not os.path.isfile(image_file):
+                    logging.warning('Dataset... The file (%s) is not existed!', image_file)
+                    continue
+                label_list.append([label_path, image_file])
             label_list = [label_list]
         else:
             raise ValueError('error in load data_path for funsd: ', subdata_label_path)
@@ -178,6 +237,7 @@ class Dataset(BaseDataset):
 
         self.seq_len = config.get('max_seq_len', 50)
         self.recg_loss = config.get('recg_loss', 'CE')
+        self.anno_cache = config.get('anno_cache', False)
         self.label_converter = LabelConverter(
             seq_len=self.seq_len,
             recg_loss=self.recg_loss)
@@ -188,7 +248,7 @@ class Dataset(BaseDataset):
         config = self.config
         example = examples[0]
         anno_path = example['boxes_and_texts_file']
-        anno = _parse_ann_info_funsd(anno_path)
+        anno = _parse_ann_info_funsd(anno_path, self.anno_cache)
         # sort the box based on the position
         anno = _sort_box_with_list(anno)
 
@@ -207,7 +267,7 @@ class Dataset(BaseDataset):
         label_word['polys'] = np.array(polys, dtype=np.float32).reshape(-1, 4, 2)
         label_word['texts'] = np.array(texts, dtype=np.int64)
         label_word['classes'] = np.array(classes, dtype=np.int64)
-        label_word['ignore_tags'] = np.array(ignore_tags, dtype=np.bool)
+        label_word['ignore_tags'] = np.array(ignore_tags, dtype=np.bool_)
 
         data = self.transform(label_word)
         return data
@@ -215,20 +275,15 @@ class Dataset(BaseDataset):
     def _read_data(self, example):
         """load image from image path and return image with data path
         Input:
-            example: ['X51005268200.txt', '../funsd/training_data/image/'] <List>
+            example: ['X51005268200.json', '../funsd/training_data/image/X51005268200.png'] <List>
         Output:
             example: readed image and label path <Dict>
         """
 
         data_path, image_path = example
-        image_name = os.path.basename(data_path).replace('.json', '.png')
-        image_path = os.path.join(image_path, image_name)
-
-        if not os.path.exists(image_path):
-            logging.warning('Dataset... The file (%s) is not existed!', image_path)
-            return None
         try:
-            image = cv2.imread(image_path)
+            buf = np.fromfile(image_path, dtype=np.uint8)
+            image = cv2.imdecode(buf, cv2.IMREAD_COLOR)
         except:
             logging.debug('Dataset... Error in read %s', image_path)
             return None